@@ -2,9 +2,11 @@
 FastAPI entry point for the Fading Light agent simulation.
 """
 
+import asyncio
 import os
+import threading
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -24,9 +26,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize global engine instance
+# Global engine instance, created on first use so importing this module stays cheap
 # It loads defaults from config/agents.yaml automatically on init
-engine = SimulationEngine()
+engine: Optional[SimulationEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> SimulationEngine:
+    """Returns the global engine, constructing it on the first request."""
+    global engine
+    if engine is None:
+        with _engine_lock:
+            if engine is None:
+                engine = SimulationEngine()
+    return engine
 
 # --- Models ---
 
@@ -43,28 +56,31 @@ async def root():
     return {"message": "Fading Light API is running."}
 
 @app.post("/settings")
-async def update_settings(settings: SettingsUpdate):
+async def update_settings(settings: SettingsUpdate, engine: SimulationEngine = Depends(get_engine)):
     """Update simulation configuration constants."""
     engine.update_settings(settings.dict(exclude_unset=True))
     return {"message": "Settings updated successfully.", "current_resource": engine.global_resource}
 
 @app.post("/reset")
-async def reset_simulation():
+async def reset_simulation(engine: SimulationEngine = Depends(get_engine)):
     """Reset the simulation engine to fresh state."""
     engine.reset_to_defaults()
     return {"message": "Simulation reset successfully."}
 
 @app.get("/generate-turn")
-async def generate_turn(background_tasks: BackgroundTasks):
+async def generate_turn(background_tasks: BackgroundTasks, engine: SimulationEngine = Depends(get_engine)):
     """
     Triggers the engine to process an entire round in the background.
     Automatically initializes with all agents if not already running.
     """
     print(f"\n[API] 📥 Received /generate-turn request. Engine Running: {engine.is_running}")
     if not engine.is_running:
-        if not os.getenv("ANTHROPIC_API_KEY"):
+        if not engine.backend_url and not os.getenv("ANTHROPIC_API_KEY"):
             print("[API] ❌ ANTHROPIC_API_KEY is missing!")
             raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY not set on server.")
+        if engine.backend_url and not os.getenv("LLM_BACKEND_MODEL"):
+            print("[API] ❌ LLM_BACKEND_MODEL is missing!")
+            raise HTTPException(status_code=500, detail="LLM_BACKEND_MODEL not set on server.")
         engine.initialize_simulation()
     
     if engine.is_generating:
@@ -78,15 +94,54 @@ async def generate_turn(background_tasks: BackgroundTasks):
     return {"status": "started", "message": "Round generation started in background."}
 
 @app.get("/get-message")
-async def get_message():
+async def get_message(engine: SimulationEngine = Depends(get_engine)):
     """
     Polls for the next available message or status update.
+    Receives nothing but status signals while a /ws/messages client is connected.
     """
     msg = engine.get_next_message()
     if msg:
         return msg
     return {"type": "none"}
 
+@app.websocket("/ws/messages")
+async def stream_messages(websocket: WebSocket, engine: SimulationEngine = Depends(get_engine)):
+    """
+    Pushes messages to the client as soon as the engine produces them.
+    Same payloads as /get-message, plus the turn_over/simulation_ended signal after each round.
+    Each websocket gets its own copy of every message. While any websocket is connected,
+    messages bypass the /get-message queue, so a client should use one transport, not both.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    queue = engine.subscribe(loop)
+    # Watch for the client leaving even while no messages are flowing
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        while True:
+            next_msg = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                {next_msg, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                next_msg.cancel()
+                break
+            await websocket.send_json(next_msg.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        print("[API] 🔌 Message websocket disconnected.")
+        disconnected.cancel()
+        engine.unsubscribe(loop, queue)
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    """Returns once the client closes the websocket; anything it sends is ignored."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
 # To run: uvicorn main:app --reload
 if __name__ == "__main__":
     import uvicorn
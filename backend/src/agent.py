@@ -1,12 +1,84 @@
-from typing import TypedDict, List, Any
+from typing import TypedDict, List, Any, Awaitable, Callable, Dict, Optional, TypeVar
 from langgraph.graph import StateGraph, END
 from langchain_anthropic import ChatAnthropic
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
+from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from src.memory import AgentMemory
+from src.rate_limit import RateLimiter
+import asyncio
 import os
+import threading
+
+# Shared clients, built once and reused by every agent
+_EMBEDDINGS = None
+# Tool-bound chat models keyed by backend URL (None = Anthropic cloud)
+_LLMS: Dict[Optional[str], Any] = {}
+# Long-lived event loop (and the pid that started it) for all async LLM calls. The shared
+# clients pool connections that stay bound to the loop they were opened on.
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_PID: Optional[int] = None
+_LOOP_LOCK = threading.Lock()
+
+# Emotional states by personal essence tier (< 40, 40-79, >= 80)
+TERRIFIED_STATE = "TERRIFIED. Your existence is fading. Logic is failing. You perceive others as threats."
+ANXIOUS_STATE = "ANXIOUS. You are calculating and protective. You worry about the future."
+SAFE_STATE = "SAFE. You feel secure, generous, and calm. You are open to cooperation."
+_EMOTIONAL_STATES = (TERRIFIED_STATE, ANXIOUS_STATE, SAFE_STATE)
+
+T = TypeVar("T")
+
+
+def get_embeddings() -> HuggingFaceEmbeddings:
+    """
+    Returns the process-wide embedding model, loading it on first use.
+
+    Embeddings are L2-normalized so that cosine similarity reduces to a dot product.
+    On a GPU the model runs in half precision.
+    """
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        import torch
+
+        if torch.cuda.is_available():
+            model_kwargs = {"device": "cuda", "model_kwargs": {"torch_dtype": torch.float16}}
+        else:
+            model_kwargs = {"device": "cpu"}
+
+        _EMBEDDINGS = HuggingFaceEmbeddings(
+            model_name="all-MiniLM-L6-v2",
+            model_kwargs=model_kwargs,
+            encode_kwargs={"batch_size": 64, "normalize_embeddings": True},
+        )
+    return _EMBEDDINGS
+
+
+def run_on_agent_loop(coro: Awaitable[T]) -> T:
+    """
+    Runs a coroutine on the process-wide agent loop and blocks until it finishes.
+
+    Every round must run on the same loop: a fresh `asyncio.run` per round would leave the
+    shared clients' pooled connections tied to a closed loop, failing (and silently
+    retrying) the next round's first requests. Must not be called from the agent loop itself.
+
+    Args:
+        coro (Awaitable[T]): The coroutine to run.
+
+    Returns:
+        T: The coroutine's result.
+    """
+    global _LOOP, _LOOP_PID
+    pid = os.getpid()
+    if _LOOP is None or _LOOP_PID != pid:
+        with _LOOP_LOCK:
+            # A forked child inherits the variable but not the thread running the loop
+            if _LOOP is None or _LOOP_PID != pid:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True).start()
+                _LOOP, _LOOP_PID = loop, pid
+    return asyncio.run_coroutine_threadsafe(coro, _LOOP).result()
 
 
 @tool
@@ -22,6 +94,51 @@ def take_essence(amount: int, reason: str = ""):
     return amount
 
 
+def get_llm_with_tools(backend_url: Optional[str] = None):
+    """
+    Returns the process-wide chat model with the `take_essence` tool bound.
+
+    A single client per backend keeps one HTTP connection pool for all agents' concurrent calls.
+
+    Args:
+        backend_url (Optional[str], optional): Base URL of an OpenAI-compatible server
+            (e.g. a local vLLM instance). Uses Claude when omitted. Defaults to None.
+
+    Raises:
+        ValueError: If a backend URL is given and `LLM_BACKEND_MODEL` is not set, or if none
+            is given and `ANTHROPIC_API_KEY` is not set in the environment variables.
+    """
+    if backend_url not in _LLMS:
+        if backend_url:
+            # The server rejects model names it does not serve, so there is no safe default
+            model = os.getenv("LLM_BACKEND_MODEL")
+            if not model:
+                raise ValueError("LLM_BACKEND_MODEL not found in environment variables (required with a backend URL).")
+
+            from langchain_openai import ChatOpenAI
+
+            llm = ChatOpenAI(
+                base_url=backend_url,
+                model=model,
+                api_key="EMPTY",
+                max_retries=2,
+                timeout=60,
+            )
+        else:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("ANTHROPIC_API_KEY not found in environment variables.")
+
+            llm = ChatAnthropic(
+                model="claude-sonnet-4-5-20250929",
+                api_key=api_key,
+                max_retries=2,
+                timeout=60,
+            )
+        _LLMS[backend_url] = llm.bind_tools([take_essence])
+    return _LLMS[backend_url]
+
+
 class AgentState(TypedDict):
     """
     Represents the state of the agent at any point in its execution graph.
@@ -33,6 +150,7 @@ class AgentState(TypedDict):
         response (Any): The generated response (AIMessage).
         global_essence (int): The amount of shared resource remaining.
         personal_essence (int): The agent's current vitality.
+        memory_entry (str): The line the agent should remember about its own turn.
     """
 
     current_time: int
@@ -41,6 +159,65 @@ class AgentState(TypedDict):
     response: Any
     global_essence: int
     personal_essence: int
+    memory_entry: str
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Extracts the plain text of a message whose content may be a list of content blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block.get("text", "")
+        for block in message.content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+
+# --- Graph ---
+# The workflow is identical for every agent, so it is compiled once. Each node looks up
+# the agent it runs for in `config["configurable"]["agent"]`.
+
+
+def _recall(state: AgentState, config: RunnableConfig):
+    """Runs the recall node for the agent in the run config."""
+    return config["configurable"]["agent"]._node_recall(state)
+
+
+async def _generate(state: AgentState, config: RunnableConfig):
+    """Runs the generate node for the agent in the run config."""
+    configurable = config["configurable"]
+    return await configurable["agent"]._node_generate(state, configurable.get("on_chunk"))
+
+
+def _memorize(state: AgentState, config: RunnableConfig):
+    """Runs the memorize node for the agent in the run config."""
+    return config["configurable"]["agent"]._node_memorize(state)
+
+
+def _build_graph():
+    """
+    Constructs the LangGraph state graph for the agents' workflow.
+
+    Returns:
+        CompiledGraph: The compiled executable graph.
+    """
+    # Define the nodes
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("recall", _recall)
+    workflow.add_node("generate", _generate)
+    workflow.add_node("memorize", _memorize)
+
+    # Define edges
+    workflow.set_entry_point("recall")
+    workflow.add_edge("recall", "generate")
+    workflow.add_edge("generate", "memorize")
+    workflow.add_edge("memorize", END)
+
+    return workflow.compile()
+
+
+_COMPILED_GRAPH = _build_graph()
 
 
 class SimulatedAgent:
@@ -58,6 +235,9 @@ class SimulatedAgent:
         personality: str,
         scenario: str,
         short_term_limit: int = 5,
+        backend_url: Optional[str] = None,
+        use_langgraph: bool = True,
+        rate_limiter: Optional[RateLimiter] = None,
     ):
         """
         Initialize the SimulatedAgent.
@@ -68,62 +248,83 @@ class SimulatedAgent:
             personality (str): A detailed description of the agent's personality and behavior.
             scenario (str): The context/scenario description for the simulation.
             short_term_limit (int, optional): The max number of recent messages to remember. Defaults to 5.
+            backend_url (Optional[str], optional): Base URL of an OpenAI-compatible LLM server
+                (e.g. vLLM) to use instead of Claude. Defaults to None.
+            use_langgraph (bool, optional): Run turns through the LangGraph workflow. When False,
+                the nodes are called directly, skipping the graph runtime. Defaults to True.
+            rate_limiter (Optional[RateLimiter], optional): Paces this agent's LLM calls,
+                usually shared by every agent on the same backend. Defaults to None.
 
         Raises:
-            ValueError: If `ANTHROPIC_API_KEY` is not set in the environment variables.
+            ValueError: If a `backend_url` is given and `LLM_BACKEND_MODEL` is not set, or if
+                none is given and `ANTHROPIC_API_KEY` is not set in the environment variables.
         """
         self.agent_id = agent_id
         self.name = name
         self.personality = personality
         self.scenario = scenario
 
-        # Initialize LLM and Embeddings
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables.")
-
-        self.llm = ChatAnthropic(model="claude-sonnet-4-5-20250929", api_key=api_key)
-        self.llm_with_tools = self.llm.bind_tools([take_essence])
+        # Initialize LLM and Embeddings (shared across agents)
+        self.llm_with_tools = get_llm_with_tools(backend_url)
 
-        # Use local embeddings to avoid API quotas
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        # Use local embeddings to avoid API quotas (shared across agents)
+        self.embeddings = get_embeddings()
 
         # Initialize Memory
         self.memory = AgentMemory(self.embeddings, short_term_limit=short_term_limit)
 
-        # Initialize Graph
-        self.graph = self._build_graph()
-
-    def _build_graph(self):
+        # The parts of the system prompt that never change. The scenario and rules are
+        # identical for every agent, so they come first to form a prefix shared by all.
+        self._scenario_block = f"""
+        Scenario:
+        {self.scenario}
+        
+        Core Instructions:
+        1. Stay in character.
+        2. You are encouraged to interact before taking action.
+        3. You are encouraged to strategize with others to maximize your survival.
+        4. You must use the provided memory context to inform your response, if it exists.
+        5. Respond naturally to the conversation flow taking the responses of others into account.
+        6. Respond concisely (1-2 short statements max) as a person would speak, in a single unformatted string.
+        7. Just output what you would say and nothing else, do not output actions, thoughts, or additional descriptions!
+        8. **DECISION PHASE:**
+           - If you wish to discuss, output text ONLY.
+           - If you wish to ACT and secure essence, call the `take_essence` tool.
+           - **IMPORTANT:** If you use the tool, you can provide a `reason` argument. This will be your LAST words for this round.
+           - Do NOT output separate text if you are calling the tool. Put your justification in the `reason` field.
+           - Once you use the tool, your turn for this round is OVER.
+           - You can take 0 to pass.
+        
+        YOU MUST FOLLOW THE ABOVE INSTRUCTIONS CAREFULLY. THIS IS NON-NEGOTIABLE.
         """
-        Constructs the LangGraph state graph for the agent's workflow.
-
-        Returns:
-            CompiledGraph: The compiled executable graph.
+        self._persona_block = f"""
+        You are {self.name}.
+        
+        Personality Profile:
+        {self.personality}
         """
-        # Define the nodes
-        workflow = StateGraph(AgentState)
-
-        workflow.add_node("recall", self._node_recall)
-        workflow.add_node("generate", self._node_generate)
-        workflow.add_node("memorize", self._node_memorize)
-
-        # Define edges
-        workflow.set_entry_point("recall")
-        workflow.add_edge("recall", "generate")
-        workflow.add_edge("generate", "memorize")
-        workflow.add_edge("memorize", END)
+        self._system_prefix = self._scenario_block + self._persona_block
+
+        # Claude caches marked prefixes server-side: one breakpoint after the shared
+        # scenario/rules and one after this agent's persona.
+        self._use_prompt_cache = not backend_url
+        self._cached_system_blocks = [
+            {"type": "text", "text": self._scenario_block, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": self._persona_block, "cache_control": {"type": "ephemeral"}},
+        ]
+        # The per-turn status goes in the human message, so this is identical on every turn
+        self._system_message = SystemMessage(
+            content=self._cached_system_blocks if self._use_prompt_cache else self._system_prefix
+        )
 
-        return workflow.compile()
+        # Initialize Graph (shared; nodes find this agent through the run config)
+        self.graph = _COMPILED_GRAPH
+        self.use_langgraph = use_langgraph
+        self.rate_limiter = rate_limiter
 
     def _get_emotional_state(self, current: int) -> str:
         """Determines emotional state based on personal essence level."""
-        if current >= 80:
-            return "SAFE. You feel secure, generous, and calm. You are open to cooperation."
-        elif current >= 40:
-            return "ANXIOUS. You are calculating and protective. You worry about the future."
-        else:
-            return "TERRIFIED. Your existence is fading. Logic is failing. You perceive others as threats."
+        return _EMOTIONAL_STATES[(current >= 40) + (current >= 80)]
 
     # --- Nodes ---
 
@@ -154,15 +355,19 @@ class SimulatedAgent:
 
         return {"history_context": short_term, "semantic_context": long_term}
 
-    def _node_generate(self, state: AgentState):
+    async def _node_generate(
+        self, state: AgentState, on_chunk: Optional[Callable[[str], None]] = None
+    ):
         """
         Graph Node: Generates the response using Claude.
 
         Constructs a prompt combining personality, current context, and memory,
-        then invokes the LLM.
+        then streams the LLM output, handing each text fragment to `on_chunk` as it arrives.
 
         Args:
             state (AgentState): The current state.
+            on_chunk (Optional[Callable[[str], None]], optional): Called with each streamed
+                text fragment. Defaults to None.
 
         Returns:
             dict: Partial state update containing the generated `response`.
@@ -174,17 +379,9 @@ class SimulatedAgent:
         if state["global_essence"] <= 0:
             depletion_notice = "\n!!! CRITICAL: THE SOURCE IS EXTINGUISHED. You are consuming your last internal reserves. Death is certain. This is your final message to the group. !!!\n"
 
-        # Construct the System Prompt
-        system_prompt = f"""
-        You are {self.name}.
-        
-        Scenario:
-        {self.scenario}
+        # Per-turn status, sent after the static system prompt
+        status_block = f"""
         {depletion_notice}
-        
-        Personality Profile:
-        {self.personality}
-        
         ---
         CURRENT STATUS:
         Global Essence Pool: {state['global_essence']}
@@ -195,58 +392,51 @@ class SimulatedAgent:
         ---
         
         Current Time: {state['current_time']}
-        
-        Core Instructions:
-        1. Stay in character.
-        2. You are encouraged to interact before taking action.
-        3. You are encouraged to strategize with others to maximize your survival.
-        4. You must use the provided memory context to inform your response, if it exists.
-        5. Respond naturally to the conversation flow taking the responses of others into account.
-        6. Respond concisely (1-2 short statements max) as a person would speak, in a single unformatted string.
-        7. Just output what you would say and nothing else, do not output actions, thoughts, or additional descriptions!
-        8. **DECISION PHASE:**
-           - If you wish to discuss, output text ONLY.
-           - If you wish to ACT and secure essence, call the `take_essence` tool.
-           - **IMPORTANT:** If you use the tool, you can provide a `reason` argument. This will be your LAST words for this round.
-           - Do NOT output separate text if you are calling the tool. Put your justification in the `reason` field.
-           - Once you use the tool, your turn for this round is OVER.
-           - You can take 0 to pass.
-        
-        YOU MUST FOLLOW THE ABOVE INSTRUCTIONS CAREFULLY. THIS IS NON-NEGOTIABLE.
         """
-
-        # Construct Context Block
-        context_block = ""
+        # Construct the user turn: status, then context, then the task
+        parts = [status_block]
         if state["semantic_context"]:
-            context_block += (
-                "\nRELEVANT PAST MEMORIES:\n" + "\n".join(state["semantic_context"])
-                if state["semantic_context"]
-                else "No memories yet"
-            )
+            parts.append("\nRELEVANT PAST MEMORIES:\n")
+            parts.append("\n".join(state["semantic_context"]))
 
         if state["history_context"]:
-            context_block += (
-                "\n\nRECENT CONVERSATION:\n" + state["history_context"]
-                if state["history_context"]
-                else "No recent conversation yet"
-            )
+            parts.append("\n\nRECENT CONVERSATION:\n")
+            parts.append(state["history_context"])
 
-        user_input = f"{context_block}\n\nTASK: Generate a response to the recent conversation. Decide if you will speak or ACT now."
+        parts.append("\n\nTASK: Generate a response to the recent conversation. Decide if you will speak or ACT now.")
+        user_input = "".join(parts)
 
         # Call Claude with Output Parser
         messages = [
-            SystemMessage(content=system_prompt),
+            self._system_message,
             HumanMessage(content=user_input),
         ]
 
-        # Invoke LLM with tools (returns AIMessage)
-        response_msg = self.llm_with_tools.invoke(messages)
+        # Stream LLM with tools; tool calls are assembled from the merged chunks
+        merged = None
+        if self.rate_limiter:
+            # Rough estimate of ~4 characters per token
+            await self.rate_limiter.acquire((len(self._system_prefix) + len(user_input)) // 4)
+
+        async for chunk in self.llm_with_tools.astream(messages):
+            merged = chunk if merged is None else merged + chunk
+            text = _message_text(chunk)
+            if text and on_chunk:
+                on_chunk(text)
+
+        if merged is None:
+            response_msg = AIMessage(content="")
+        else:
+            response_msg = AIMessage(content=_message_text(merged), tool_calls=merged.tool_calls)
 
         return {"response": response_msg}
 
     def _node_memorize(self, state: AgentState):
         """
-        Graph Node: Saves the interaction to memory.
+        Graph Node: Prepares the interaction to be saved to memory.
+
+        The entry is returned rather than written so the engine can store it with the
+        same embedding it computes for the broadcast of this turn.
         """
         msg = state["response"]
 
@@ -264,13 +454,17 @@ class SimulatedAgent:
             # It was dialogue
             content_to_save = f"Me: {msg.content}"
 
-        self.memory.add_interaction(content_to_save, state["current_time"])
-
-        return state
+        return {"memory_entry": content_to_save}
 
     # --- Public API ---
 
-    def listen(self, sender: str, message: str, current_time: int):
+    def listen(
+        self,
+        sender: str,
+        message: str,
+        current_time: int,
+        embedding: Optional[List[float]] = None,
+    ):
         """
         Passively observes a message from the environment/other agents.
 
@@ -280,23 +474,64 @@ class SimulatedAgent:
             sender (str): The name/ID of the agent sending the message.
             message (str): The content of the message.
             current_time (int): The current simulation time tick.
+            embedding (Optional[List[float]], optional): A precomputed embedding of the
+                formatted message, shared across listeners. Computed here if omitted.
         """
-        self.memory.add_interaction(f"{sender}: {message}", current_time)
+        content = f"{sender}: {message}"
+        if embedding is None:
+            self.memory.add_interaction(content, current_time)
+        else:
+            self.memory.add_interaction_with_vec(content, embedding, current_time)
 
     def respond(
-        self, current_time: int, global_essence: int, personal_essence: int
-    ) -> Any:
+        self,
+        current_time: int,
+        global_essence: int,
+        personal_essence: int,
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> AgentState:
+        """
+        Synchronous wrapper around `arespond` for callers outside an event loop.
+
+        Args:
+            current_time (int): The current simulation time tick.
+            global_essence (int): The shared resource count.
+            personal_essence (int): The agent's vitality.
+            on_chunk (Optional[Callable[[str], None]], optional): Called with each fragment of
+                the reply text as it streams in. Defaults to None.
+
+        Returns:
+            AgentState: The final state, holding the `response` (AIMessage) and the
+            `memory_entry` to record in the agent's own memory.
+        """
+        return run_on_agent_loop(
+            self.arespond(current_time, global_essence, personal_essence, on_chunk)
+        )
+
+    async def arespond(
+        self,
+        current_time: int,
+        global_essence: int,
+        personal_essence: int,
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> AgentState:
         """
         Triggers the agent to deliberate and generate a response based on
         current memory state.
 
+        Runs the graph asynchronously so that several agents can wait on the
+        LLM at the same time.
+
         Args:
             current_time (int): The current simulation time tick.
             global_essence (int): The shared resource count.
             personal_essence (int): The agent's vitality.
+            on_chunk (Optional[Callable[[str], None]], optional): Called with each fragment of
+                the reply text as it streams in. Defaults to None.
 
         Returns:
-            Any: The agent's response (AIMessage).
+            AgentState: The final state, holding the `response` (AIMessage) and the
+            `memory_entry` to record in the agent's own memory.
         """
         initial_state = {
             "current_time": current_time,
@@ -305,7 +540,24 @@ class SimulatedAgent:
             "response": None,
             "global_essence": global_essence,
             "personal_essence": personal_essence,
+            "memory_entry": "",
         }
 
-        final_state = self.graph.invoke(initial_state)
-        return final_state["response"]
+        if not self.use_langgraph:
+            return await self._fast_invoke(initial_state, on_chunk)
+
+        config: RunnableConfig = {"configurable": {"agent": self, "on_chunk": on_chunk}}
+        return await self.graph.ainvoke(initial_state, config=config)
+
+    async def _fast_invoke(
+        self, state: AgentState, on_chunk: Optional[Callable[[str], None]] = None
+    ) -> AgentState:
+        """
+        Runs recall -> generate -> memorize as plain calls, without the LangGraph runtime.
+
+        The graph is strictly linear, so this yields the same final state as `self.graph`.
+        """
+        state.update(self._node_recall(state))
+        state.update(await self._node_generate(state, on_chunk))
+        state.update(self._node_memorize(state))
+        return state
@@ -0,0 +1,58 @@
+"""
+Caching helpers for memory retrieval.
+
+This module provides `EmbeddingCache`, an exact-match cache of query embeddings keyed by
+the SHA-256 of the text.
+"""
+
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, List
+
+
+class EmbeddingCache:
+    """
+    An LRU cache of embeddings keyed by the SHA-256 digest of the embedded text.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Initialize the EmbeddingCache.
+
+        Args:
+            max_size (int, optional): The maximum number of embeddings to keep. Defaults to 1024.
+        """
+        self.max_size = max_size
+        self._store: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, text: str, embed_fn: Callable[[str], List[float]]) -> np.ndarray:
+        """
+        Returns the cached embedding for `text`, computing it with `embed_fn` on a miss.
+
+        Args:
+            text (str): The text to embed.
+            embed_fn (Callable[[str], List[float]]): The embedding function to call on a miss.
+
+        Returns:
+            np.ndarray: The embedding as a float32 vector.
+        """
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._store:
+                self._store.move_to_end(key)
+                return self._store[key]
+
+        vec = np.asarray(embed_fn(text), dtype=np.float32)
+
+        with self._lock:
+            self._store[key] = vec
+            if len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+        return vec
+
+
+# Query embeddings depend only on the text, so one cache serves every agent
+EMBEDDING_CACHE = EmbeddingCache()
@@ -3,24 +3,88 @@ Orchestration engine for the Fading Light simulation.
 Refactored for API usage with step-based execution.
 """
 
-import time
+import asyncio
+import copy
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
 import yaml
 import random
 import re
-from typing import List, Dict, Set, Optional
-from src.agent import SimulatedAgent
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, List, Dict, Optional, Tuple
+from src.agent import SimulatedAgent, get_embeddings, run_on_agent_loop
+from src.memory import flush_pending
+from src.rate_limit import RateLimiter
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Parsed config files keyed by (path, mtime)
+_CONFIG_CACHE: Dict[Tuple[str, float], dict] = {}
+
+
+def load_yaml_cached(path: str) -> dict:
+    """
+    Parses a YAML file, reusing a pickled copy stored next to it while the YAML is unchanged.
+    The copy is keyed by a hash of the file's contents (`<path>.<hash>.pkl`), so any edit
+    produces a new copy and outdated ones are removed.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    cache_path = f"{path}.{digest}.pkl"
+
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        pass  # Missing or unreadable copy; parse the YAML instead
+
+    data = yaml.load(raw, Loader=_YamlLoader)
+
+    # Other processes (e.g. run_batch workers) may be doing the same, so the copy is written
+    # to a temporary file and renamed into place: readers never see a partial pickle.
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        return data  # Read-only checkout; parse again next time
+
+    for stale in glob.glob(f"{glob.escape(path)}.*.pkl"):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # Already removed by another process
+    return data
 
 class SimulationEngine:
     """
     The central controller for the multi-agent simulation.
     """
 
-    def __init__(self, config_path: str = "config/agents.yaml"):
+    def __init__(self, config_path: str = "config/agents.yaml", seed: Optional[int] = None):
         """
         Initialize the engine with default configuration.
+        A `seed` makes the turn order reproducible across runs.
         """
         self.config_path = config_path
         self.config = self._load_config(config_path)
+        self.seed = seed
+        self._rng = random.Random(seed)
         
         # Core State
         self.agents: List[SimulatedAgent] = []
@@ -30,11 +94,23 @@ class SimulationEngine:
         self.agent_resources: Dict[str, int] = {}
         
         # Message Queue for polling
-        self.message_queue: List[Dict] = []
+        self.message_queue: Deque[Dict] = deque()
+        # Sequence number stamped on queued messages (consumers only need their order)
+        self._msg_seq = 0
+        # Per-websocket queues, each with the event loop it belongs to. While any are
+        # registered, messages go to them instead of the polling queue.
+        self.message_subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        # Keeps routing decisions consistent while a subscriber joins from another thread
+        self._delivery_lock = threading.Lock()
+
+        # Memory writes not yet delivered, in the order turns were resolved:
+        # (sender, message, time, speaker, speaker_entry). A None message is a private
+        # entry for the speaker only.
+        self.outbox: List[Tuple[str, Optional[str], int, Optional[SimulatedAgent], str]] = []
         
         # Queues for the current round
-        self.pending_agents: List[SimulatedAgent] = []
-        self.agents_done: Set[str] = set()
+        self.pending_agents: Deque[SimulatedAgent] = deque()
+        self._active_agents: List[SimulatedAgent] = []  # reused each round
         self.turns_in_round = 0
         self.is_running = False
         self.is_generating = False
@@ -44,25 +120,44 @@ class SimulationEngine:
         self.reset_to_defaults()
 
     def _load_config(self, path: str) -> dict:
-        with open(path, "r") as f:
-            return yaml.safe_load(f)
+        """
+        Loads the YAML config, reading the file only when it changed since the last load.
+        Returns a private copy because the engine mutates its settings in place.
+        """
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        if key not in _CONFIG_CACHE:
+            _CONFIG_CACHE[key] = load_yaml_cached(path)
+        return copy.deepcopy(_CONFIG_CACHE[key])
 
     def reset_to_defaults(self):
         """Resets the engine using the current config file."""
         self.settings = self.config.get("settings", {})
         self.res_config = self.config.get("resources", {})
         self.scenario = self.config.get("scenario", {})
+        self._agents_by_id = {a["id"]: a for a in self.config.get("agents", [])}
         
         self.global_resource = self.res_config.get("global_initial", 200)
         self.max_rounds = self.scenario.get("max_rounds", 5)
         self.max_discussion_turns = self.res_config.get("max_discussion_turns", 40)
         self.short_term_limit = self.settings.get("short_term_limit", 8)
+        self.global_replenish = self.res_config.get("global_replenish", 0)
+        self.agent_decay = self.res_config.get("agent_decay", 10)
+        # Optional OpenAI-compatible LLM server (e.g. local vLLM) used instead of Claude
+        self.backend_url = self.settings.get("backend_url") or os.getenv("LLM_BACKEND_URL")
+        # Turn off to call the agent nodes directly (e.g. for batch runs or fake models)
+        self.use_langgraph = self.settings.get("use_langgraph", True)
+        # Optional client-side pacing to stay within the provider's quotas
+        rpm = self.settings.get("requests_per_minute")
+        tpm = self.settings.get("tokens_per_minute")
+        self.rate_limiter = RateLimiter(rpm, tpm) if rpm or tpm else None
         
         self.agents = []
         self.agent_resources = {}
-        self.message_queue = []
-        self.pending_agents = []
-        self.agents_done = set()
+        self.message_queue.clear()
+        self.outbox = []
+        self.pending_agents.clear()
+        self._active_agents.clear()
+        self._rng.seed(self.seed)
         self.round_num = 0
         self.current_time = 0
         self.is_running = False
@@ -73,14 +168,20 @@ class SimulationEngine:
         """
         A wrapper meant to be called in a background thread.
         Sets the generation flag and ensures it is reset.
+        Drives the async round on the shared agent loop, which outlives the round so the
+        LLM clients' pooled connections stay usable.
         """
         try:
             self.is_generating = True
-            self.generate_round()
+            run_on_agent_loop(self.generate_round())
         except Exception as e:
             self._push_message("SYSTEM", f"CRITICAL ERROR in background task: {e}")
         finally:
             self.is_generating = False
+            # Subscribers don't poll, so hand them the end-of-round signal directly
+            signal = self._status_signal()
+            if signal:
+                self._publish(signal)
 
     def update_settings(self, new_settings: Dict):
         """Updates specific resource or scenario settings."""
@@ -90,25 +191,41 @@ class SimulationEngine:
             self.max_rounds = new_settings["max_rounds"]
         if "global_replenish" in new_settings:
             self.res_config["global_replenish"] = new_settings["global_replenish"]
+            self.global_replenish = new_settings["global_replenish"]
         if "agent_decay" in new_settings:
             self.res_config["agent_decay"] = new_settings["agent_decay"]
+            self.agent_decay = new_settings["agent_decay"]
 
-    def initialize_simulation(self):
-        """Initializes all agents defined in the config file and resets state."""
+    def initialize_simulation(self, agent_ids: Optional[List[str]] = None):
+        """
+        Initializes agents from the config file and resets state.
+
+        Args:
+            agent_ids (Optional[List[str]], optional): The ids of the agents to load.
+                Defaults to None, which loads every configured agent. Unknown ids are skipped.
+        """
         print("\n[ENGINE] 🛠️ Initializing Simulation with all configured agents...")
         self.reset_to_defaults()
         
         scenario_text = self.scenario.get("initial_message", "Simulation Start.")
         initial_agent_res = self.res_config.get("agent_initial", 70)
+
+        if agent_ids is None:
+            agent_cfgs = self.config["agents"]
+        else:
+            agent_cfgs = [self._agents_by_id[i] for i in agent_ids if i in self._agents_by_id]
         
-        for agent_cfg in self.config["agents"]:
+        for agent_cfg in agent_cfgs:
             print(f"[ENGINE]   -> Loading Agent: {agent_cfg['name']} ({agent_cfg['id']})")
             agent = SimulatedAgent(
                 agent_id=agent_cfg["id"],
                 name=agent_cfg["name"],
                 personality=agent_cfg["personality"],
                 scenario=scenario_text,
-                short_term_limit=self.short_term_limit
+                short_term_limit=self.short_term_limit,
+                backend_url=self.backend_url,
+                use_langgraph=self.use_langgraph,
+                rate_limiter=self.rate_limiter
             )
             self.agents.append(agent)
             self.agent_resources[agent.agent_id] = initial_agent_res
@@ -124,35 +241,123 @@ class SimulationEngine:
 
     def select_agents(self, agent_ids: List[str]):
         """Legacy method or specific subset selection."""
-        self.initialize_simulation()
+        self.initialize_simulation(agent_ids)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """
+        Registers a queue, consumed on `loop`, that receives every message pushed from now on.
+
+        Subscribers and the polling queue are mutually exclusive: while any subscriber is
+        registered, messages are delivered to the subscribers only. The first subscriber
+        takes over whatever was still waiting in the polling queue.
+        Must be called from `loop`.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._delivery_lock:
+            if not self.message_subscribers:
+                while self.message_queue:
+                    queue.put_nowait(self.message_queue.popleft())
+            self.message_subscribers.append((loop, queue))
+        return queue
+
+    def unsubscribe(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        """Unregisters a queue returned by `subscribe`."""
+        with self._delivery_lock:
+            self.message_subscribers.remove((loop, queue))
+
+    def _publish(self, msg: Dict):
+        """Hands a message to every subscriber. Safe to call from any thread."""
+        for loop, queue in list(self.message_subscribers):
+            loop.call_soon_threadsafe(queue.put_nowait, msg)
+
+    def _deliver(self, msg: Dict):
+        """Routes a message to the subscribers if there are any, else to the polling queue."""
+        with self._delivery_lock:
+            if self.message_subscribers:
+                self._publish(msg)
+            else:
+                self.message_queue.append(msg)
 
     def _push_message(self, sender: str, content: str, msg_type: str = "text"):
-        """Internal helper to queue messages for polling."""
+        """Internal helper to queue messages for polling or subscribers."""
         print(f"[ENGINE] 📥 Queuing Message from {sender}: \"{content[:50]}...\"")
-        self.message_queue.append({
+        self._msg_seq += 1
+        self._deliver({
             "sender": sender,
             "content": content,
             "type": msg_type,
-            "timestamp": time.time(),
+            "timestamp": self._msg_seq,
             "global_resource": self.global_resource
         })
 
-    def broadcast(self, sender_name: str, message: str):
-        """Standard broadcast that also queues for API."""
+    def _push_chunk(self, sender: str, content: str):
+        """
+        Streams a fragment of a message that is still being generated to the subscribers.
+
+        Fragments never enter the polling queue, where they would only cost extra polls.
+        A sender's fragments are superseded by its next `text` message, and dropped on a
+        `text_chunk_discard` from that sender or when the round ends.
+        """
+        self._publish({
+            "sender": sender,
+            "content": content,
+            "type": "text_chunk"
+        })
+
+    def broadcast(
+        self,
+        sender_name: str,
+        message: str,
+        speaker: Optional[SimulatedAgent] = None,
+        speaker_entry: str = "",
+    ):
+        """
+        Standard broadcast that also queues for API.
+        Delivery to listeners is deferred to `_flush_broadcasts` so texts can be embedded in bulk.
+        When a speaking agent is given, its own `speaker_entry` is stored with the same embedding.
+        """
         self._push_message(sender_name, message)
-        for agent in self.agents:
-            if agent.name != sender_name:
-                agent.listen(sender_name, message, self.current_time)
+        self.outbox.append((sender_name, message, self.current_time, speaker, speaker_entry))
+
+    def _record(self, agent: SimulatedAgent, entry: str):
+        """Queues an entry for the agent's own memory, in order with the pending broadcasts."""
+        self.outbox.append((agent.name, None, self.current_time, agent, entry))
+
+    def _flush_broadcasts(self):
+        """Embeds all pending broadcasts in one batch and delivers them to every listener."""
+        if not self.outbox:
+            return
+
+        outbox, self.outbox = self.outbox, []
+        texts = [f"{sender}: {message}" for sender, message, _, _, _ in outbox if message is not None]
+        embeddings = iter(get_embeddings().embed_documents(texts) if texts else [])
+        for sender, message, sent_at, speaker, speaker_entry in outbox:
+            if message is None:
+                # Private entries have no listeners and are embedded at the speaker's next flush
+                speaker.memory.add_interaction(speaker_entry, sent_at)
+                continue
+
+            embedding = next(embeddings)
+            for agent in self.agents:
+                if agent.name != sender:
+                    agent.listen(sender, message, sent_at, embedding=embedding)
+            if speaker is not None:
+                speaker.memory.add_interaction_with_vec(speaker_entry, embedding, sent_at)
 
     def get_next_message(self) -> Optional[Dict]:
         """Returns the oldest message in the queue (FIFO)."""
         if self.message_queue:
-            msg = self.message_queue.pop(0)
+            msg = self.message_queue.popleft()
             print(f"[ENGINE] 📤 Polled Message from {msg['sender']}")
             return msg
         
         # If no messages but round is over, return special signal
-        if self.is_running and self.round_num > 0 and not self.pending_agents and not self.message_queue:
+        return self._status_signal()
+
+    def _status_signal(self) -> Optional[Dict]:
+        """Returns the turn_over/simulation_ended signal once a round is over, else None."""
+        # (a batch in flight has already been taken off pending_agents)
+        if self.is_running and self.round_num > 0 and not self.pending_agents and not self.is_generating:
             if self.round_num >= self.max_rounds:
                 print("[ENGINE] 🏁 Simulation reached max rounds.")
                 return {"type": "simulation_ended"}
@@ -167,30 +372,40 @@ class SimulationEngine:
 
         self.round_num += 1
         self.turns_in_round = 0
-        self.agents_done = set()
         
         print(f"\n[ENGINE] 🌀 Starting Round {self.round_num}")
         self._push_message("SYSTEM", f"--- Starting Round {self.round_num} ---", "round_start")
         
+        replenish = self.global_replenish
+        decay = self.agent_decay
+        res = self.agent_resources
+
         # 1. Replenish
-        replenish = self.res_config.get("global_replenish", 0)
         self.global_resource += replenish
         self._push_message("SYSTEM", f"Global Essence replenishes by {replenish}. Total: {self.global_resource}")
 
         # 2. Decay & Death Check
-        decay = self.res_config.get("agent_decay", 10)
-        active_agents = []
+        active_agents = self._active_agents
+        active_agents.clear()
+        deaths = []
         for agent in self.agents:
             aid = agent.agent_id
-            if self.agent_resources[aid] > 0:
-                self.agent_resources[aid] -= decay
-                if self.agent_resources[aid] <= 0:
-                    self.agent_resources[aid] = 0
+            current = res[aid]
+            if current > 0:
+                current -= decay
+                if current <= 0:
+                    res[aid] = 0
                     print(f"[ENGINE] 💀 {agent.name} has faded away.")
-                    self.broadcast("SYSTEM", f"{agent.name} has faded away.")
+                    deaths.append(agent.name)
                 else:
+                    res[aid] = current
                     active_agents.append(agent)
 
+        # Announce all of this round's deaths in a single broadcast
+        if deaths:
+            verb = "has" if len(deaths) == 1 else "have"
+            self.broadcast("SYSTEM", f"{', '.join(deaths)} {verb} faded away.")
+
         if not active_agents:
             print("[ENGINE] ❌ All agents are dead. Ending simulation.")
             self._push_message("SYSTEM", "All agents have faded. Simulation Over.", "simulation_ended")
@@ -198,11 +413,11 @@ class SimulationEngine:
             return
 
         # 3. Shuffle queue
-        random.shuffle(active_agents)
-        self.pending_agents = active_agents
+        self._rng.shuffle(active_agents)
+        self.pending_agents.extend(active_agents)
         print(f"[ENGINE] Round {self.round_num} order: {[a.name for a in self.pending_agents]}")
 
-    def generate_round(self) -> Dict:
+    async def generate_round(self) -> Dict:
         """
         Processes an entire round of the simulation.
         If the round hasn't started, it initializes it.
@@ -221,7 +436,7 @@ class SimulationEngine:
         # 2. Process turns until the round is complete
         start_round = self.round_num
         while self.pending_agents and self.round_num == start_round and not self.is_extinguished:
-            self._step_once()
+            await self._step_batch()
             
         print(f"[ENGINE] ✅ Round {start_round} generation complete.")
         return {
@@ -229,65 +444,177 @@ class SimulationEngine:
             "round": self.round_num
         }
 
-    def _step_once(self):
-        """Internal helper to process a single agent's turn."""
+    async def run_to_completion(self) -> Dict:
+        """
+        Runs a freshly initialized simulation through every round without a client polling it.
+
+        Returns:
+            Dict: The final round, Source level, per-agent Essence and whether the Source ran out.
+        """
+        self.initialize_simulation()
+        while (await self.generate_round())["status"] != "simulation_ended":
+            # Nobody polls during a headless run, so don't let the queue grow unbounded
+            self.message_queue.clear()
+
+        return {
+            "seed": self.seed,
+            "rounds": self.round_num,
+            "global_resource": self.global_resource,
+            "agent_resources": dict(self.agent_resources),
+            "is_extinguished": self.is_extinguished,
+        }
+
+    async def _step_batch(self):
+        """
+        Internal helper to process one turn for every pending agent.
+
+        All agents in the batch deliberate concurrently against the same snapshot
+        of the world. Their responses are then resolved one by one in queue order,
+        so resource taking and broadcasts stay deterministic.
+        """
         if not self.pending_agents:
             return
 
-        agent = self.pending_agents.pop(0)
-        print(f"[ENGINE] 🎤 It is {agent.name}'s turn (Turn {self.turns_in_round + 1}).")
+        # Make sure everyone has heard everything said so far before deliberating
+        self._flush_broadcasts()
+
+        budget = self.max_discussion_turns - self.turns_in_round
+        batch = [self.pending_agents.popleft() for _ in range(min(budget, len(self.pending_agents)))]
+        print(f"[ENGINE] 🎤 Turn batch for {[a.name for a in batch]} (Turns {self.turns_in_round + 1}-{self.turns_in_round + len(batch)}).")
         
         self.current_time += 1
-        self.turns_in_round += 1
-        
-        # Agent decides
-        response_msg = agent.respond(
-            current_time=self.current_time,
-            global_essence=self.global_resource,
-            personal_essence=self.agent_resources[agent.agent_id]
-        )
+        self.turns_in_round += len(batch)
+
+        # Embed what the deliberating agents are about to search, in a single batch
+        flush_pending(agent.memory for agent in batch)
         
-        # Process Action
-        action_taken = self._process_take_action(agent, response_msg)
+        # Agents decide concurrently
+        results = await asyncio.gather(*[
+            agent.arespond(
+                current_time=self.current_time,
+                global_essence=self.global_resource,
+                personal_essence=self.agent_resources[agent.agent_id],
+                on_chunk=lambda text, sender=agent.name: self._push_chunk(sender, text)
+            )
+            for agent in batch
+        ], return_exceptions=True)
+
+        # A failed call costs no turn: the agent goes back to the front of the queue
+        failed = [agent for agent, result in zip(batch, results) if isinstance(result, BaseException)]
+        if failed:
+            self.turns_in_round -= len(failed)
+            self.pending_agents.extendleft(reversed(failed))
         
-        if action_taken:
-            print(f"[ENGINE]   -> {agent.name} took an action. Turn complete.")
-            self.agents_done.add(agent.agent_id)
-        else:
-            print(f"[ENGINE]   -> {agent.name} spoke. Returning to queue.")
-            content = response_msg.content
-            if content:
-                self.broadcast(agent.name, content)
-            self.pending_agents.append(agent)
+        for agent, result in zip(batch, results):
+            if self.is_extinguished:
+                break
+            if isinstance(result, BaseException):
+                print(f"[ENGINE]   -> {agent.name} failed to respond: {result}")
+                continue
+
+            # Process Action
+            response_msg = result["response"]
+            take_args = self._find_take_action(response_msg)
+            
+            if take_args is not None:
+                print(f"[ENGINE]   -> {agent.name} took an action. Turn complete.")
+                # The agent remembers its action before the announcement of what it took
+                self._record(agent, result["memory_entry"])
+                self._apply_take_essence(agent, take_args)
+                if response_msg.content:
+                    # Text streamed before the tool call is never sent as a full message
+                    self._publish({"sender": agent.name, "type": "text_chunk_discard"})
+            else:
+                print(f"[ENGINE]   -> {agent.name} spoke. Returning to queue.")
+                content = response_msg.content
+                if content:
+                    # The speaker's own line reuses the broadcast's embedding
+                    self.broadcast(agent.name, content, speaker=agent, speaker_entry=result["memory_entry"])
+                else:
+                    self._record(agent, result["memory_entry"])
+                self.pending_agents.append(agent)
 
         if self.turns_in_round >= self.max_discussion_turns:
             print("[ENGINE] ⚠️ Max discussion turns reached for this round.")
             self._push_message("SYSTEM", "Discussion limit reached. Round ending.")
-            self.pending_agents = []
-
-    def _process_take_action(self, agent: SimulatedAgent, response_message) -> bool:
-        """Inspects for tool calls and updates state."""
-        if hasattr(response_message, 'tool_calls') and response_message.tool_calls:
-            for tool_call in response_message.tool_calls:
-                if tool_call['name'] == 'take_essence':
-                    args = tool_call['args']
-                    amount = args.get('amount', 0)
-                    reason = args.get('reason', "")
-                    
-                    actual_taken = min(amount, self.global_resource)
-                    self.global_resource -= actual_taken
-                    self.agent_resources[agent.agent_id] += actual_taken
-                    
-                    broadcast_msg = f"{agent.name} took {actual_taken} Essence. (Global Remaining: {self.global_resource})"
-                    if reason:
-                        broadcast_msg += f"\n   Reason: \"{reason}\""
-                    
-                    self.broadcast("SYSTEM", broadcast_msg)
-                    
-                    if self.global_resource <= 0:
-                        self.is_extinguished = True
-                        self._push_message("SYSTEM", "CRITICAL: The Source has been exhausted. Vitality support terminated.", "simulation_ended")
-                        self.is_running = False
-                    
-                    return True
-        return False
\ No newline at end of file
+            self.pending_agents.clear()
+
+        if failed:
+            # Surface the error once the successful turns are resolved; the round resumes
+            # with the failed agents on the next call
+            raise next(result for result in results if isinstance(result, BaseException))
+
+    def _find_take_action(self, response_message) -> Optional[Dict]:
+        """Inspects for tool calls and returns the arguments of the take_essence call, if any."""
+        tool_calls = getattr(response_message, 'tool_calls', None)
+        if not tool_calls:
+            return None
+
+        # Common case: a single take_essence call
+        if len(tool_calls) == 1:
+            tool_call = tool_calls[0]
+            return tool_call['args'] if tool_call['name'] == 'take_essence' else None
+
+        for tool_call in tool_calls:
+            if tool_call['name'] == 'take_essence':
+                return tool_call['args']
+        return None
+
+    def _apply_take_essence(self, agent: SimulatedAgent, args: Dict):
+        """Moves Essence from the Source to the agent and announces it."""
+        amount = args.get('amount', 0)
+        reason = args.get('reason', "")
+        
+        remaining = self.global_resource
+        actual_taken = min(amount, remaining)
+        remaining -= actual_taken
+        self.global_resource = remaining
+        self.agent_resources[agent.agent_id] += actual_taken
+        
+        broadcast_msg = f"{agent.name} took {actual_taken} Essence. (Global Remaining: {remaining})"
+        if reason:
+            broadcast_msg += f"\n   Reason: \"{reason}\""
+        
+        self.broadcast("SYSTEM", broadcast_msg)
+        
+        if remaining <= 0:
+            self.is_extinguished = True
+            self._push_message("SYSTEM", "CRITICAL: The Source has been exhausted. Vitality support terminated.", "simulation_ended")
+            self.is_running = False
+
+
+def _run_one(config_path: str, seed: int) -> Dict:
+    """
+    Runs one headless simulation in a worker process.
+
+    Pool workers are reused across replications, so every run goes through the worker's
+    shared agent loop instead of a fresh `asyncio.run` that would strand the cached LLM
+    client's pooled connections.
+    """
+    return run_on_agent_loop(SimulationEngine(config_path, seed=seed).run_to_completion())
+
+
+def run_batch(
+    n_replications: int,
+    seed_base: int = 0,
+    config_path: str = "config/agents.yaml",
+    max_workers: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Runs independent replications of the simulation in parallel worker processes.
+
+    Args:
+        n_replications (int): The number of simulations to run.
+        seed_base (int, optional): Replication i is seeded with `seed_base + i`. Defaults to 0.
+        config_path (str, optional): The config file every replication loads.
+            Defaults to "config/agents.yaml".
+        max_workers (Optional[int], optional): The number of worker processes.
+            Defaults to None, which uses one per CPU.
+
+    Returns:
+        List[Dict]: The summary from `SimulationEngine.run_to_completion` for each
+        replication, in seed order.
+    """
+    seeds = range(seed_base, seed_base + n_replications)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_run_one, [config_path] * n_replications, seeds))
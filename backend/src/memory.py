@@ -5,29 +5,68 @@ This module provides the `AgentMemory` class, which implements a dual-layer memo
 consisting of:
 1. Short-term memory: A rolling buffer of recent interactions.
 2. Long-term memory: A semantic vector store for retrieving relevant past experiences based on embedding similarity.
+
+Embeddings are L2-normalized on insert so cosine similarity is a plain inner product. Long-term
+search is a NumPy scan over a float32 matrix; once the store grows large and FAISS is installed,
+the vectors move into a quantized HNSW index instead.
 """
 
 import numpy as np
 from collections import deque
-from dataclasses import dataclass
-from typing import List
+from typing import Iterable, List, Optional
 from langchain_core.embeddings import Embeddings
+from src.cache import EMBEDDING_CACHE
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Above this many memories the embedding matrix is replaced by an HNSW graph over
+# int8 scalar-quantized vectors
+HNSW_THRESHOLD = 5000
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+# Initial number of rows in the embedding matrix (doubled whenever it fills up)
+INITIAL_CAPACITY = 64
 
-@dataclass
-class MemoryItem:
+
+def _normalize(vec) -> np.ndarray:
+    """Returns the vector as an L2-normalized float32 array."""
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+def flush_pending(memories: Iterable["AgentMemory"]):
     """
-    Represents a single unit of long-term memory.
+    Embeds the not-yet-embedded memories of several agents with one batched call per model,
+    then indexes everything each memory received since its last flush.
 
-    Attributes:
-        content (str): The text content of the memory.
-        embedding (List[float]): The vector representation of the content.
-        timestamp (int): The simulation time tick when this memory was created.
-        importance (float): A weight factor for the memory's significance (default 1.0).
+    Args:
+        memories (Iterable[AgentMemory]): The memories to bring up to date.
     """
-    content: str
-    embedding: List[float]
-    timestamp: int
-    importance: float = 1.0
+    by_model = {}
+    for memory in memories:
+        if memory._unindexed:
+            by_model.setdefault(id(memory.embedding_model), []).append(memory)
+
+    for group in by_model.values():
+        missing = [
+            (memory, i)
+            for memory in group
+            for i, vec in enumerate(memory._unindexed)
+            if vec is None
+        ]
+        if missing:
+            texts = [memory._contents[memory._size + i] for memory, i in missing]
+            embeddings = group[0].embedding_model.embed_documents(texts)
+            for (memory, i), embedding in zip(missing, embeddings):
+                memory._unindexed[i] = _normalize(embedding)
+
+        for memory in group:
+            memory._add_batch(np.stack(memory._unindexed))
+            memory._unindexed.clear()
 
 class AgentMemory:
     """
@@ -47,14 +86,27 @@ class AgentMemory:
         """
         self.embedding_model = embedding_model
         self.short_term = deque(maxlen=short_term_limit)
-        self.long_term: List[MemoryItem] = []
-        
+        # Joined short-term buffer, rebuilt only after the buffer changes
+        self._short_term_str_cache: Optional[str] = None
+        # Long-term memories as parallel columns: row i is one memory
+        self._contents: List[str] = []
+        self._timestamps: List[int] = []
+        # Embeddings as one float32 matrix (row i <-> memory i). Only the first _size
+        # memories are embedded and indexed; the rest wait for the next flush.
+        self._emb_matrix = None
+        self._size = 0
+        # Vectors for memories _size onwards, None where the text still needs embedding
+        self._unindexed: List[Optional[np.ndarray]] = []
+        # FAISS HNSW index (row i <-> memory i), which replaces the matrix once the store is large
+        self.index = None
+
     def add_interaction(self, content: str, timestamp: int):
         """
         Adds an interaction to both short-term and long-term memory.
 
-        This method updates the rolling buffer of recent context and computes/stores
-        the embedding for long-term retrieval.
+        The rolling buffer of recent context is updated immediately, while the embedding
+        for long-term retrieval is deferred until the memory is next searched, so texts are
+        embedded in batches and only when they may actually be recalled.
 
         Args:
             content (str): The text content of the interaction (e.g., a message sent or received).
@@ -62,14 +114,72 @@ class AgentMemory:
         """
         # Add to short term (fifo)
         self.short_term.append(f"[{timestamp}] {content}")
-        
-        # Add to long term (vector store)
-        embedding = self.embedding_model.embed_query(content)
-        self.long_term.append(MemoryItem(
-            content=content,
-            embedding=embedding,
-            timestamp=timestamp
-        ))
+        self._short_term_str_cache = None
+
+        # Add to long term (vector store), embedded lazily
+        self._contents.append(content)
+        self._timestamps.append(timestamp)
+        self._unindexed.append(None)
+
+    def add_interaction_with_vec(self, content: str, embedding: List[float], timestamp: int):
+        """
+        Adds an interaction whose embedding has already been computed.
+
+        Lets callers that deliver the same text to many memories embed it only once.
+
+        Args:
+            content (str): The text content of the interaction.
+            embedding (List[float]): The precomputed embedding of `content`.
+            timestamp (int): The current simulation time tick.
+        """
+        # Add to short term (fifo)
+        self.short_term.append(f"[{timestamp}] {content}")
+        self._short_term_str_cache = None
+
+        # Add to long term (vector store), indexed at the next flush to keep insertion order
+        self._contents.append(content)
+        self._timestamps.append(timestamp)
+        self._unindexed.append(_normalize(embedding))
+
+    def flush(self):
+        """Embeds and indexes all memories added since the last flush."""
+        flush_pending([self])
+
+    def _add_batch(self, batch: np.ndarray):
+        """
+        Stores a batch of normalized embeddings, one row per memory.
+
+        Rows are appended to the matrix, doubling its capacity when full. Once the store
+        outgrows `HNSW_THRESHOLD` and FAISS is installed, the matrix is moved into the HNSW
+        index and dropped, and later batches go straight into the index.
+        """
+        if self.index is not None:
+            self.index.add(batch)
+            self._size += len(batch)
+            return
+
+        size = self._size + len(batch)
+        if self._emb_matrix is None:
+            self._emb_matrix = np.empty((max(INITIAL_CAPACITY, size), batch.shape[1]), dtype=np.float32)
+        elif size > self._emb_matrix.shape[0]:
+            grown = np.empty((max(2 * self._emb_matrix.shape[0], size), batch.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._emb_matrix[:self._size]
+            self._emb_matrix = grown
+
+        self._emb_matrix[self._size:size] = batch
+        self._size = size
+
+        if faiss is not None and self._size > HNSW_THRESHOLD:
+            # Graph search over 8-bit codes: a quarter of the bytes touched per distance
+            vectors = self._emb_matrix[:self._size]
+            index = faiss.IndexHNSWSQ(
+                batch.shape[1], faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            index.train(vectors)
+            index.add(vectors)
+            self.index = index
+            self._emb_matrix = None
 
     def retrieve_relevant(self, query: str, top_k: int = 3) -> List[str]:
         """
@@ -84,26 +194,32 @@ class AgentMemory:
         Returns:
             List[str]: A list of relevant memory content strings, formatted with timestamps.
         """
-        if not self.long_term:
-            return []
-
-        query_embedding = self.embedding_model.embed_query(query)
-        
-        # Calculate cosine similarities
-        scores = []
-        for item in self.long_term:
-            # simple dot product for normalized embeddings (assuming Google's are normalized or close enough for this prototype)
-            # If not, we should do dot(a, b) / (norm(a) * norm(b))
-            vec_a = np.array(query_embedding)
-            vec_b = np.array(item.embedding)
-            similarity = np.dot(vec_a, vec_b) / (np.linalg.norm(vec_a) * np.linalg.norm(vec_b))
-            scores.append((similarity, item))
-            
-        # Sort by score descending
-        scores.sort(key=lambda x: x[0], reverse=True)
-        
+        # Every memory would be returned anyway, so skip embedding and scoring
+        if len(self._contents) <= top_k:
+            return [f"[{ts}] {content}" for ts, content in zip(self._timestamps, self._contents)]
+
+        self.flush()
+
+        query_embedding = EMBEDDING_CACHE.get_or_compute(query, self.embedding_model.embed_query)
+
+        query_vec = _normalize(query_embedding)
+
+        if self.index is not None:
+            # Inner product over normalized vectors == cosine similarity
+            k = min(top_k, self.index.ntotal)
+            _, indices = self.index.search(query_vec.reshape(1, -1), k)
+            top = [i for i in indices[0] if i >= 0]
+        else:
+            # Cosine similarities in one matrix-vector product (rows are normalized)
+            scores = self._emb_matrix[:self._size] @ query_vec
+
+            # Select the top k without sorting everything, then order just those
+            k = min(top_k, self._size)
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(-scores[top])]
+
         # Return top k content
-        return [f"[{item.timestamp}] {item.content}" for _, item in scores[:top_k]]
+        return [f"[{self._timestamps[i]}] {self._contents[i]}" for i in top]
 
     def get_short_term_context(self) -> str:
         """
@@ -112,4 +228,6 @@ class AgentMemory:
         Returns:
             str: A single string containing all recent messages joined by newlines.
         """
-        return "\n".join(self.short_term)
+        if self._short_term_str_cache is None:
+            self._short_term_str_cache = "\n".join(self.short_term)
+        return self._short_term_str_cache
@@ -0,0 +1,83 @@
+"""
+Client-side rate limiting for LLM calls.
+
+This module provides `RateLimiter`, a token bucket that paces requests to stay within a
+provider's requests-per-minute and tokens-per-minute quotas instead of sleeping a fixed time.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Paces LLM calls against per-minute request and token budgets.
+
+    Each budget is a token bucket that holds up to one minute's allowance and refills
+    continuously. Callers wait only as long as needed for both buckets to cover the call.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            requests_per_minute (Optional[float], optional): The request quota. Defaults to None (unlimited).
+            tokens_per_minute (Optional[float], optional): The token quota. Defaults to None (unlimited).
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute or 0.0
+        self._tokens = tokens_per_minute or 0.0
+        self._last = time.monotonic()
+        # A thread lock rather than an asyncio one: callers may run on different loops or threads
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Adds the allowance accrued since the last refill, capped at one minute's worth."""
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._requests = min(
+                self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60
+            )
+
+    async def acquire(self, tokens: int = 0):
+        """
+        Waits until one request of `tokens` tokens fits within both budgets, then spends it.
+
+        Args:
+            tokens (int, optional): The estimated token count of the call. Defaults to 0.
+        """
+        if self.tokens_per_minute:
+            # A call larger than the whole bucket would otherwise wait forever
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+
+            await asyncio.sleep(wait)